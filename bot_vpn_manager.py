@@ -1,8 +1,10 @@
 import logging
 import asyncio
-from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Final, FrozenSet
+from dataclasses import asdict
+from time import time_ns
 
-from aiogram import Bot, Dispatcher, types, F
+from aiogram import BaseMiddleware, Bot, Dispatcher, types, F
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.context import FSMContext
@@ -14,12 +16,15 @@ from aiogram.filters.command import Command
 # Если нет - тогда можно заменить @dp.message(F.text.startswith("/start")).
 
 from aiogram.client.bot import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
 
 from config import Config
 from vpn_service import VPNService
 from promocode import PromocodeService
 from request_service import RequestService, Request
-from json_utils import JSONDataStore
+from request import format_timestamp_ms
+from json_utils import BatchingJSONStore, JSONLDataStore, KeyedJSONLStore
+from rate_limiter import OutboundLimiter
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,17 +33,59 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 config = Config()
+_ADMIN_IDS = config.BOT_ADMINS
+# Тот же набор в виде кортежа - для рассылки уведомлений
+_ADMIN_ID_LIST = tuple(sorted(_ADMIN_IDS))
 
 bot = Bot(
     token=config.TELEGRAM_TOKEN,
+    session=AiohttpSession(limit=config.TELEGRAM_CONNECTION_LIMIT),
     default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN)
 )
+# Все исходящие сообщения проходят через ограничитель частоты
+bot.session.middleware(OutboundLimiter(
+    global_rate=config.TELEGRAM_GLOBAL_RATE,
+    group_rate_per_minute=config.TELEGRAM_GROUP_RATE,
+    max_retries=config.TELEGRAM_MAX_RETRIES
+))
 storage = MemoryStorage()
 dp = Dispatcher(storage=storage)
 
-users_store = JSONDataStore(config.USERS_FILE)
-promocodes_store = JSONDataStore(config.PROMOCODES_FILE)
-requests_store = JSONDataStore(config.REQUESTS_FILE)
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """
+    Ограничивает количество одновременно обрабатываемых апдейтов, чтобы всплеск
+    входящих сообщений не порождал неограниченное число активных хендлеров.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with self._semaphore:
+            return await handler(event, data)
+
+
+dp.update.outer_middleware(ConcurrencyLimitMiddleware(config.MAX_CONCURRENT_UPDATES))
+
+users_store = KeyedJSONLStore(
+    config.USERS_FILE, "user_id", config.USERS_FLUSH_INTERVAL, legacy_path=config.USERS_LEGACY_FILE
+)
+promocodes_store = BatchingJSONStore(config.PROMOCODES_FILE, config.STORE_FLUSH_INTERVAL)
+requests_store = JSONLDataStore(
+    config.REQUESTS_FILE, config.STORE_FLUSH_INTERVAL, legacy_path=config.REQUESTS_LEGACY_FILE
+)
+
+# Очередь фоновых задач: хендлеры сразу отвечают пользователю, а обращения к 3x-ui
+# и рассылку уведомлений выполняют воркеры. Очередь ограничена: когда она заполнена,
+# хендлер ждёт места и занимает слот MAX_CONCURRENT_UPDATES, так что лимит апдейтов
+# ограничивает и реальную работу
+task_queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=config.TASK_QUEUE_SIZE)
 
 promocode_service = PromocodeService(promocodes_store)
 request_service = RequestService(requests_store)
@@ -64,38 +111,100 @@ class PromoCodeForm(StatesGroup):
     waiting_for_promo = State()
 
 
-def get_user_keyboard():
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [
-                KeyboardButton("📄 Оформить через Промокод"),
-                KeyboardButton("✉️ Отправить Заявку Администратору")
-            ],
-            [
-                KeyboardButton("📊 Статус Подписки")
-            ]
+# Тексты кнопок клавиатур
+BTN_PROMO: Final[str] = "📄 Оформить через Промокод"
+BTN_SEND_REQUEST: Final[str] = "✉️ Отправить Заявку Администратору"
+BTN_STATUS: Final[str] = "📊 Статус Подписки"
+BTN_VIEW_REQUESTS: Final[str] = "🔍 Просмотреть Заявки"
+BTN_RESPOND_REQUEST: Final[str] = "💬 Ответить на Заявку"
+BTN_BACK: Final[str] = "⬅️ Назад"
+
+# Клавиатуры не меняются, поэтому создаются один раз и переиспользуются во всех ответах
+USER_KB: Final[ReplyKeyboardMarkup] = ReplyKeyboardMarkup(
+    keyboard=[
+        [
+            KeyboardButton(text=BTN_PROMO),
+            KeyboardButton(text=BTN_SEND_REQUEST)
         ],
-        resize_keyboard=True
-    )
-    return keyboard
-
-def get_admin_keyboard():
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [
-                KeyboardButton("🔍 Просмотреть Заявки"),
-                KeyboardButton("💬 Ответить на Заявку")
-            ],
-            [
-                KeyboardButton("⬅️ Назад")
-            ]
+        [
+            KeyboardButton(text=BTN_STATUS)
+        ]
+    ],
+    resize_keyboard=True
+)
+
+ADMIN_KB: Final[ReplyKeyboardMarkup] = ReplyKeyboardMarkup(
+    keyboard=[
+        [
+            KeyboardButton(text=BTN_VIEW_REQUESTS),
+            KeyboardButton(text=BTN_RESPOND_REQUEST)
         ],
-        resize_keyboard=True
-    )
-    return keyboard
+        [
+            KeyboardButton(text=BTN_BACK)
+        ]
+    ],
+    resize_keyboard=True
+)
+# Удаление клавиатуры на время ввода данных
+REMOVE_KB: Final[ReplyKeyboardRemove] = ReplyKeyboardRemove()
+
+STATUS_TMPL: Final[str] = (
+    "🔹 **Статус Подписки** 🔹\n"
+    "Максимальное количество устройств: {max_devices}\n"
+    "Общий трафик: {traffic_total} GB\n"
+    "Оставшийся трафик: {traffic_remaining} GB\n"
+    "Использовано трафика: {traffic_used} GB\n"
+    "Трафик вверх: {traffic_up} GB\n"
+    "Трафик вниз: {traffic_down} GB\n"
+    "Время истечения подписки: {expiry}"
+)
+
+REQUEST_TMPL: Final[str] = (
+    "🔹 **ID заявки:** {request_id}\n"
+    "👤 **Пользователь ID:** {user_id}\n"
+    "📋 **Детали:** {message}\n"
+    "📅 **Время создания:** {created_at}\n\n"
+)
 
-def is_admin(user_id: int) -> bool:
-    return user_id in config.BOT_ADMINS
+ADMIN_NEW_REQUEST_TMPL: Final[str] = (
+    "📄 Новая заявка от пользователя {user_id}.\n"
+    "ID заявки: {request_id}"
+)
+
+# Тексты ответов бота
+ADMIN_GREETING_MSG: Final[str] = "👋 Привет, администратор! Выберите действие:"
+USER_GREETING_MSG: Final[str] = "👋 Привет! Выберите способ оформления подписки:"
+ASK_PROMO_MSG: Final[str] = "📩 Пожалуйста, введите ваш промокод:"
+PROMO_APPLIED_MSG: Final[str] = "✅ Ваш промокод успешно применён! Подписка активирована."
+PROMO_FAILED_MSG: Final[str] = (
+    "❌ Неверный или уже использованный промокод. Попробуйте снова "
+    "или выберите другой способ оформления подписки."
+)
+ASK_REQUEST_DETAILS_MSG: Final[str] = (
+    "📝 Пожалуйста, введите детали вашей заявки (например, количество устройств "
+    "и предпочтительная длительность):"
+)
+REQUEST_SENT_MSG: Final[str] = "✅ Ваша заявка успешно отправлена администратору. Ожидайте ответа."
+REQUEST_FAILED_MSG: Final[str] = "❌ Произошла ошибка при отправке заявки. Пожалуйста, попробуйте позже."
+NO_SUBSCRIPTION_MSG: Final[str] = "❌ У вас нет активной подписки или произошла ошибка при получении данных."
+NO_PERMS_MSG: Final[str] = "❌ У вас нет прав для использования этой команды."
+NO_PENDING_MSG: Final[str] = "📭 Нет новых заявок для обработки."
+PENDING_HEADER_MSG: Final[str] = "📄 **Список Новых Заявок:**\n\n"
+ASK_REQUEST_ID_MSG: Final[str] = "🔍 Пожалуйста, введите ID заявки, на которую хотите ответить:"
+REQUEST_NOT_FOUND_MSG: Final[str] = (
+    "❌ Заявка с таким ID не найдена или уже обработана. "
+    "Пожалуйста, введите корректный ID заявки."
+)
+ASK_RESPONSE_MSG: Final[str] = "💬 Пожалуйста, введите сообщение для пользователя:"
+RESPONSE_SENT_MSG: Final[str] = "✅ Сообщение пользователю успешно отправлено и заявка обновлена."
+RESPONSE_FAILED_MSG: Final[str] = "❌ Произошла ошибка при отправке сообщения пользователю или обновлении заявки."
+BACK_TO_ADMIN_MSG: Final[str] = "👋 Вы вернулись в административное меню."
+BACK_TO_USER_MSG: Final[str] = "👋 Вы вернулись в главное меню."
+PROCESSING_MSG: Final[str] = "⏳ Обрабатываем…"
+TASK_FAILED_MSG: Final[str] = "❌ Не удалось обработать запрос. Пожалуйста, попробуйте позже."
+
+def is_admin(user_id: int, _admin_ids: FrozenSet[int] = _ADMIN_IDS) -> bool:
+    return user_id in _admin_ids
 
 # -- Хендлер на /start
 @dp.message(Command("start"))
@@ -103,21 +212,20 @@ async def cmd_start(message: types.Message):
     user_id = message.from_user.id
     if is_admin(user_id):
         await message.answer(
-            "👋 Привет, администратор! Выберите действие:",
-            reply_markup=get_admin_keyboard()
+            ADMIN_GREETING_MSG,
+            reply_markup=ADMIN_KB
         )
     else:
         await message.answer(
-            "👋 Привет! Выберите способ оформления подписки:",
-            reply_markup=get_user_keyboard()
+            USER_GREETING_MSG,
+            reply_markup=USER_KB
         )
 
 # -- Хендлер нажатия "📄 Оформить через Промокод"
-@dp.message(F.text == "📄 Оформить через Промокод")
 async def cmd_subscribe_promo(message: types.Message, state: FSMContext):
     await message.answer(
-        "📩 Пожалуйста, введите ваш промокод:",
-        reply_markup=ReplyKeyboardRemove()
+        ASK_PROMO_MSG,
+        reply_markup=REMOVE_KB
     )
     await state.set_state(PromoCodeForm.waiting_for_promo)
 
@@ -126,28 +234,16 @@ async def process_promo_code(message: types.Message, state: FSMContext):
     promo_code = message.text.strip()
     user_id = message.from_user.id
 
-    success = await vpn_service.apply_promocode(user_id, promo_code)
-    if success:
-        await message.answer(
-            "✅ Ваш промокод успешно применён! Подписка активирована.",
-            reply_markup=get_user_keyboard()
-        )
-    else:
-        await message.answer(
-            "❌ Неверный или уже использованный промокод. Попробуйте снова "
-            "или выберите другой способ оформления подписки.",
-            reply_markup=get_user_keyboard()
-        )
+    await task_queue.put({"kind": "promo", "user_id": user_id, "code": promo_code})
+    await message.answer(PROCESSING_MSG)
     await state.clear()
 
 # -- Хендлер кнопки "✉️ Отправить Заявку Администратору"
-@dp.message(F.text == "✉️ Отправить Заявку Администратору")
 async def cmd_send_request(message: types.Message, state: FSMContext):
-    await SendRequestForm.waiting_for_details.set()
+    await state.set_state(SendRequestForm.waiting_for_details)
     await message.answer(
-        "📝 Пожалуйста, введите детали вашей заявки (например, количество устройств "
-        "и предпочтительная длительность):",
-        reply_markup=ReplyKeyboardRemove()
+        ASK_REQUEST_DETAILS_MSG,
+        reply_markup=REMOVE_KB
     )
 
 @dp.message(SendRequestForm.waiting_for_details, F.text)
@@ -156,7 +252,7 @@ async def process_request_details(message: types.Message, state: FSMContext):
     details = {"message": message.text.strip()}
 
     request_id = await request_service.generate_new_request_id()
-    timestamp = int(datetime.now(timezone.utc).timestamp() * 1000)
+    timestamp = time_ns() // 1_000_000
     new_request = Request(
         request_id=request_id,
         user_id=user_id,
@@ -165,97 +261,67 @@ async def process_request_details(message: types.Message, state: FSMContext):
         timestamp=timestamp
     )
 
-    success = await request_service.create_request(new_request)
-    if success:
-        await message.answer(
-            "✅ Ваша заявка успешно отправлена администратору. Ожидайте ответа.",
-            reply_markup=get_user_keyboard()
-        )
-        logger.info(f"Новая заявка {request_id} от пользователя {user_id} создана.")
-
-        for admin_id in config.BOT_ADMINS:
-            try:
-                await bot.send_message(
-                    chat_id=admin_id,
-                    text=(f"📄 Новая заявка от пользователя {user_id}.\n"
-                          f"ID заявки: {request_id}")
-                )
-            except Exception as e:
-                logger.error(f"Не удалось отправить уведомление администратору {admin_id}: {e}")
-    else:
-        await message.answer(
-            "❌ Произошла ошибка при отправке заявки. Пожалуйста, попробуйте позже.",
-            reply_markup=get_user_keyboard()
-        )
+    await task_queue.put({"kind": "request", "user_id": user_id, "request": new_request})
+    await message.answer(PROCESSING_MSG)
     await state.clear()
 
 # -- Хендлер "📊 Статус Подписки"
-@dp.message(F.text == "📊 Статус Подписки")
-async def cmd_status(message: types.Message):
+async def cmd_status(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
     client_data = await vpn_service.get_client_data(user_id)
     if client_data:
-        expiry_datetime = datetime.fromtimestamp(
-            client_data.expiry_time / 1000
-        ).strftime('%Y-%m-%d %H:%M:%S')
-
-        status_message = (
-            f"🔹 **Статус Подписки** 🔹\n"
-            f"Максимальное количество устройств: {client_data.max_devices}\n"
-            f"Общий трафик: {client_data.traffic_total} GB\n"
-            f"Оставшийся трафик: {client_data.traffic_remaining} GB\n"
-            f"Использовано трафика: {client_data.traffic_used} GB\n"
-            f"Трафик вверх: {client_data.traffic_up} GB\n"
-            f"Трафик вниз: {client_data.traffic_down} GB\n"
-            f"Время истечения подписки: {expiry_datetime}"
+        expiry_datetime = format_timestamp_ms(client_data.expiry_time)
+
+        status_message = STATUS_TMPL.format_map(
+            {**asdict(client_data), "expiry": expiry_datetime}
         )
-        await message.answer(status_message, reply_markup=get_user_keyboard())
+        await message.answer(status_message, reply_markup=USER_KB)
     else:
         await message.answer(
-            "❌ У вас нет активной подписки или произошла ошибка при получении данных.",
-            reply_markup=get_user_keyboard()
+            NO_SUBSCRIPTION_MSG,
+            reply_markup=USER_KB
         )
 
 # -- Хендлер "🔍 Просмотреть Заявки"
-@dp.message(F.text == "🔍 Просмотреть Заявки")
-async def cmd_view_requests(message: types.Message):
+async def cmd_view_requests(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
     if not is_admin(user_id):
-        await message.answer("❌ У вас нет прав для использования этой команды.")
+        await message.answer(NO_PERMS_MSG)
         return
 
     pending_requests = await request_service.list_requests(status_filter="pending")
     if not pending_requests:
         await message.answer(
-            "📭 Нет новых заявок для обработки.",
-            reply_markup=get_admin_keyboard()
+            NO_PENDING_MSG,
+            reply_markup=ADMIN_KB
         )
         return
 
-    response = "📄 **Список Новых Заявок:**\n\n"
-    for req in pending_requests:
-        response += (
-            f"🔹 **ID заявки:** {req.request_id}\n"
-            f"👤 **Пользователь ID:** {req.user_id}\n"
-            f"📋 **Детали:** {req.details.get('message', 'Нет деталей')}\n"
-            f"📅 **Время создания:** "
-            f"{datetime.fromtimestamp(req.timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    parts = [PENDING_HEADER_MSG]
+    parts.extend(
+        REQUEST_TMPL.format(
+            request_id=req.request_id,
+            user_id=req.user_id,
+            message=req.details.get('message', 'Нет деталей'),
+            created_at=req.created_at
         )
+        for req in pending_requests
+    )
+    response = "".join(parts)
 
-    await message.answer(response, reply_markup=get_admin_keyboard())
+    await message.answer(response, reply_markup=ADMIN_KB)
 
 # -- Хендлер "💬 Ответить на Заявку"
-@dp.message(F.text == "💬 Ответить на Заявку")
 async def cmd_respond_request(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
     if not is_admin(user_id):
-        await message.answer("❌ У вас нет прав для использования этой команды.")
+        await message.answer(NO_PERMS_MSG)
         return
 
-    await RespondRequest.waiting_for_request_id.set()
+    await state.set_state(RespondRequest.waiting_for_request_id)
     await message.answer(
-        "🔍 Пожалуйста, введите ID заявки, на которую хотите ответить:",
-        reply_markup=ReplyKeyboardRemove()
+        ASK_REQUEST_ID_MSG,
+        reply_markup=REMOVE_KB
     )
 
 @dp.message(RespondRequest.waiting_for_request_id, F.text)
@@ -265,17 +331,16 @@ async def process_request_id(message: types.Message, state: FSMContext):
 
     if not current_request or current_request.status != "pending":
         await message.answer(
-            "❌ Заявка с таким ID не найдена или уже обработана. "
-            "Пожалуйста, введите корректный ID заявки.",
-            reply_markup=ReplyKeyboardRemove()
+            REQUEST_NOT_FOUND_MSG,
+            reply_markup=REMOVE_KB
         )
         return
 
     await state.update_data(request_id=request_id)
-    await RespondRequest.next()
+    await state.set_state(RespondRequest.waiting_for_response_message)
     await message.answer(
-        "💬 Пожалуйста, введите сообщение для пользователя:",
-        reply_markup=ReplyKeyboardRemove()
+        ASK_RESPONSE_MSG,
+        reply_markup=REMOVE_KB
     )
 
 @dp.message(RespondRequest.waiting_for_response_message, F.text)
@@ -287,38 +352,123 @@ async def process_response_message(message: types.Message, state: FSMContext):
     success = await vpn_service.respond_to_request(request_id, response_message)
     if success:
         await message.answer(
-            "✅ Сообщение пользователю успешно отправлено и заявка обновлена.",
-            reply_markup=get_admin_keyboard()
+            RESPONSE_SENT_MSG,
+            reply_markup=ADMIN_KB
         )
     else:
         await message.answer(
-            "❌ Произошла ошибка при отправке сообщения пользователю или обновлении заявки.",
-            reply_markup=get_admin_keyboard()
+            RESPONSE_FAILED_MSG,
+            reply_markup=ADMIN_KB
         )
     await state.clear()
 
 # -- Хендлер "⬅️ Назад"
-@dp.message(F.text == "⬅️ Назад")
-async def cmd_back_to_admin(message: types.Message):
+async def cmd_back_to_admin(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
     if is_admin(user_id):
         await message.answer(
-            "👋 Вы вернулись в административное меню.",
-            reply_markup=get_admin_keyboard()
+            BACK_TO_ADMIN_MSG,
+            reply_markup=ADMIN_KB
         )
     else:
         await message.answer(
-            "👋 Вы вернулись в главное меню.",
-            reply_markup=get_user_keyboard()
+            BACK_TO_USER_MSG,
+            reply_markup=USER_KB
         )
 
+# Кнопки клавиатур и их обработчики: текст сообщения сразу указывает на нужный хендлер
+BUTTON_ROUTES: Dict[str, Callable[[types.Message, FSMContext], Awaitable[None]]] = {
+    BTN_PROMO: cmd_subscribe_promo,
+    BTN_SEND_REQUEST: cmd_send_request,
+    BTN_STATUS: cmd_status,
+    BTN_VIEW_REQUESTS: cmd_view_requests,
+    BTN_RESPOND_REQUEST: cmd_respond_request,
+    BTN_BACK: cmd_back_to_admin,
+}
+BUTTON_TEXTS = frozenset(BUTTON_ROUTES)
+
+# -- Единый хендлер нажатий на кнопки клавиатур
+@dp.message(F.text.in_(BUTTON_TEXTS))
+async def dispatch_button(message: types.Message, state: FSMContext):
+    # Фильтр F.text.in_ уже гарантирует, что текст есть среди ключей
+    await BUTTON_ROUTES[message.text](message, state)
+
+# -- Фоновая обработка задач из task_queue
+async def notify_admins(text: str) -> None:
+    """
+    Рассылает уведомление всем администраторам одновременно.
+
+    :param text: Текст уведомления.
+    """
+    await vpn_service.broadcast(_ADMIN_ID_LIST, text)
+
+async def handle_promo_task(task: Dict[str, Any]) -> None:
+    user_id = task["user_id"]
+    success = await vpn_service.apply_promocode(user_id, task["code"])
+    await bot.send_message(
+        chat_id=user_id,
+        text=PROMO_APPLIED_MSG if success else PROMO_FAILED_MSG,
+        reply_markup=USER_KB
+    )
+
+async def handle_request_task(task: Dict[str, Any]) -> None:
+    new_request: Request = task["request"]
+    user_id = new_request.user_id
+    request_id = new_request.request_id
+
+    success = await request_service.create_request(new_request)
+    if not success:
+        await bot.send_message(chat_id=user_id, text=REQUEST_FAILED_MSG, reply_markup=USER_KB)
+        return
+
+    await bot.send_message(chat_id=user_id, text=REQUEST_SENT_MSG, reply_markup=USER_KB)
+    logger.info("Новая заявка %s от пользователя %s создана.", request_id, user_id)
+
+    await notify_admins(ADMIN_NEW_REQUEST_TMPL.format(user_id=user_id, request_id=request_id))
+
+TASK_HANDLERS = {
+    "promo": handle_promo_task,
+    "request": handle_request_task,
+}
+
+async def worker():
+    while True:
+        task = await task_queue.get()
+        try:
+            await TASK_HANDLERS[task["kind"]](task)
+        except Exception as e:
+            logger.error("Ошибка при обработке фоновой задачи %s: %s", task.get("kind"), e)
+            # Иначе пользователь так и останется с сообщением "Обрабатываем…"
+            try:
+                await bot.send_message(chat_id=task["user_id"], text=TASK_FAILED_MSG, reply_markup=USER_KB)
+            except Exception as e:
+                logger.error("Не удалось сообщить пользователю %s об ошибке: %s", task["user_id"], e)
+        finally:
+            task_queue.task_done()
+
 async def main():
     await vpn_service.initialize()
+    workers = [asyncio.create_task(worker()) for _ in range(config.BACKGROUND_WORKERS)]
     try:
         logger.info("Бот запущен и готов к работе.")
         await dp.start_polling(bot)
     finally:
+        # Даём воркерам доделать уже принятые задачи
+        try:
+            await asyncio.wait_for(task_queue.join(), timeout=config.SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Не все фоновые задачи завершены до остановки бота.")
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await vpn_service.close()
         await bot.session.close()
 
 if __name__ == '__main__':
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        # uvloop не установлен - используем стандартный цикл событий
+        pass
     asyncio.run(main())
@@ -2,7 +2,7 @@
 
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ClientData:
     """
     Класс для хранения информации о клиенте VPN.
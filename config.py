@@ -2,7 +2,7 @@
 
 import os
 from dataclasses import dataclass, field
-from typing import List
+from typing import FrozenSet
 from dotenv import load_dotenv
 
 # Загрузка переменных окружения из .env
@@ -19,17 +19,35 @@ class XUIConfig:
     TOKEN: str = os.getenv("XUI_TOKEN", "your_api_token")
     SUBSCRIPTION_PREFIX: str = os.getenv("XUI_SUBSCRIPTION_PREFIX", "sub_")
     INBOUND_ID: int = int(os.getenv("INBOUND_ID", "1"))
+    MAX_CONCURRENCY: int = int(os.getenv("XUI_MAX_CONCURRENCY", "16"))  # Максимум одновременных запросов к панели
+    RETRIES: int = int(os.getenv("XUI_RETRIES", "2"))  # Повторы запроса при сетевой ошибке
+    RETRY_DELAY: float = float(os.getenv("XUI_RETRY_DELAY", "0.5"))  # Начальная задержка перед повтором (сек)
+    RELOGIN_INTERVAL: float = float(os.getenv("XUI_RELOGIN_INTERVAL", "3600"))  # Период обновления сессии панели (сек, 0 - отключить)
 
 @dataclass
 class Config:
     """
     Основной класс конфигурации, объединяющий все конфигурационные параметры.
     """
-    xui: XUIConfig = XUIConfig()
-    USERS_FILE: str = os.getenv("USERS_FILE", "data/users.json")
+    xui: XUIConfig = field(default_factory=XUIConfig)
+    USERS_FILE: str = os.getenv("USERS_FILE", "data/users.jsonl")
+    USERS_LEGACY_FILE: str = os.getenv("USERS_LEGACY_FILE", "data/users.json")  # Файл пользователей прежнего формата, переносится при запуске
     PROMOCODES_FILE: str = os.getenv("PROMOCODES_FILE", "data/promocodes.json")
-    REQUESTS_FILE: str = os.getenv("REQUESTS_FILE", "data/requests.json")
+    REQUESTS_FILE: str = os.getenv("REQUESTS_FILE", "data/requests.jsonl")
+    REQUESTS_LEGACY_FILE: str = os.getenv("REQUESTS_LEGACY_FILE", "data/requests.json")  # Файл заявок прежнего формата, переносится при запуске
+    STORE_FLUSH_INTERVAL: float = float(os.getenv("STORE_FLUSH_INTERVAL", "0.025"))  # Задержка сброса JSON-хранилищ на диск (сек)
+    USERS_FLUSH_INTERVAL: float = float(os.getenv("USERS_FLUSH_INTERVAL", "0.5"))  # Задержка уплотнения users.jsonl на диске (сек)
     TELEGRAM_TOKEN: str = os.getenv("BOT_TOKEN", "your_telegram_bot_token")
-    BOT_ADMINS: List[int] = field(default_factory=lambda: [
+    TELEGRAM_CONNECTION_LIMIT: int = int(os.getenv("TELEGRAM_CONNECTION_LIMIT", "100"))  # Размер пула соединений к Bot API
+    TELEGRAM_GLOBAL_RATE: float = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))  # Максимум исходящих сообщений в секунду
+    TELEGRAM_GROUP_RATE: float = float(os.getenv("TELEGRAM_GROUP_RATE", "20"))  # Максимум сообщений в минуту в групповой чат
+    TELEGRAM_MAX_RETRIES: int = int(os.getenv("TELEGRAM_MAX_RETRIES", "3"))  # Повторы отправки после ответа 429
+    MAX_CONCURRENT_UPDATES: int = int(os.getenv("MAX_CONCURRENT_UPDATES", "30"))  # Максимум одновременно обрабатываемых апдейтов
+    BACKGROUND_WORKERS: int = int(os.getenv("BACKGROUND_WORKERS", "4"))  # Количество воркеров фоновых задач
+    TASK_QUEUE_SIZE: int = int(os.getenv("TASK_QUEUE_SIZE", "100"))  # Максимум фоновых задач в очереди
+    SHUTDOWN_TIMEOUT: float = float(os.getenv("SHUTDOWN_TIMEOUT", "10"))  # Ожидание фоновых задач при остановке (сек)
+    EXPIRY_REMINDER_HOURS: float = float(os.getenv("EXPIRY_REMINDER_HOURS", "0"))  # За сколько часов напоминать об окончании подписки (0 - отключить)
+    # Множество, а не список: проверка прав администратора - одна операция поиска по хешу
+    BOT_ADMINS: FrozenSet[int] = field(default_factory=lambda: frozenset(
         int(admin_id) for admin_id in os.getenv("BOT_ADMINS", "").split(",") if admin_id.strip().isdigit()
-    ])
+    ))
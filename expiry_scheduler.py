@@ -0,0 +1,108 @@
+# expiry_scheduler.py
+
+import asyncio
+import heapq
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiryScheduler:
+    """
+    Планировщик напоминаний об окончании подписки.
+
+    Вместо периодического опроса всех пользователей одна фоновая задача спит до ближайшего
+    момента напоминания, хранящегося в мин-куче (время напоминания, user_id, время окончания).
+    Устаревшие записи кучи (после продления подписки) не удаляются, а пропускаются при извлечении.
+    """
+
+    def __init__(self, lead_ms: int, notify: Callable[[int, int], Awaitable[Any]]) -> None:
+        """
+        Инициализирует планировщик.
+
+        :param lead_ms: За сколько миллисекунд до окончания подписки отправлять напоминание.
+        :param notify: Корутина notify(user_id, expiry_ms), отправляющая напоминание.
+        """
+        self.lead_ms = lead_ms
+        self._notify = notify
+        self._heap: List[Tuple[int, int, int]] = []
+        # Актуальное время окончания подписки: user_id -> expiry_ms
+        self._expiry: Dict[int, int] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self, expiries: Iterable[Tuple[int, int]]) -> None:
+        """
+        Заполняет планировщик сразу для многих пользователей при запуске.
+        Напоминания, время которых уже наступило, не планируются: они могли быть
+        отправлены до перезапуска, и повторять их нельзя.
+
+        :param expiries: Пары (user_id, expiry_ms).
+        """
+        now = time.time_ns() // 1_000_000
+        for user_id, expiry_ms in expiries:
+            if expiry_ms - self.lead_ms > now:
+                self._expiry[user_id] = expiry_ms
+                self._heap.append((expiry_ms - self.lead_ms, user_id, expiry_ms))
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def schedule(self, user_id: int, expiry_ms: int) -> None:
+        """
+        Планирует (или переносит) напоминание для пользователя.
+
+        :param user_id: ID пользователя.
+        :param expiry_ms: Время окончания подписки в миллисекундах; 0 или меньше - бессрочная подписка.
+        """
+        # Бессрочная подписка или подписка короче срока напоминания (например, промокод на 1 день
+        # при напоминании за сутки): напоминать сразу после покупки бессмысленно
+        if expiry_ms - self.lead_ms <= time.time_ns() // 1_000_000:
+            self._expiry.pop(user_id, None)
+            return
+        self._expiry[user_id] = expiry_ms
+        entry = (expiry_ms - self.lead_ms, user_id, expiry_ms)
+        heapq.heappush(self._heap, entry)
+        # Будим задачу, только если новое напоминание стало ближайшим
+        if self._heap[0] is entry:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        """
+        Запускает фоновую задачу планировщика.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Останавливает фоновую задачу планировщика.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        """
+        Спит до ближайшего напоминания и отправляет все наступившие.
+        """
+        while True:
+            self._wakeup.clear()
+            now = time.time_ns() // 1_000_000
+            while self._heap and self._heap[0][0] <= now:
+                _, user_id, expiry_ms = heapq.heappop(self._heap)
+                # Подписку продлили или она уже закончилась - напоминание не нужно
+                if self._expiry.get(user_id) != expiry_ms or expiry_ms <= now:
+                    continue
+                del self._expiry[user_id]
+                try:
+                    await self._notify(user_id, expiry_ms)
+                except Exception as e:
+                    logger.error(f"Не удалось отправить напоминание пользователю {user_id}: {e}")
+            timeout = (self._heap[0][0] - now) / 1000 if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -1,16 +1,53 @@
 # json_utils.py
 
-import json
 import asyncio
-from typing import List, Dict, Any
+import json
+import logging
+from typing import AsyncIterator, BinaryIO, Callable, Iterator, List, Dict, Any, Optional, Tuple
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+
+    def _json_loads(raw: bytes) -> Any:
+        return orjson.loads(raw)
+
+    def _json_dumps(data: Any) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+    def _json_dumps_line(data: Any) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    # orjson не установлен - используем стандартный модуль json
+    def _json_loads(raw: bytes) -> Any:
+        return json.loads(raw)
+
+    def _json_dumps(data: Any) -> bytes:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+    def _json_dumps_line(data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+WRITE_BUFFER_SIZE = 1 << 20  # Размер буфера записи JSON-файлов (1 МБ)
+READ_BUFFER_SIZE = 1 << 16  # Размер буфера построчного чтения JSON Lines (64 КБ)
+STALE_CHECK_INTERVAL = 1.0  # Как часто проверять, не изменён ли файл извне (в секундах)
+COMPACT_MIN_STALE_LINES = 100  # Минимум устаревших строк JSON Lines перед уплотнением файла
+FLUSH_DELAY = 0.025  # Окно накопления изменений перед записью на диск (в секундах)
 
 class JSONDataStore:
     """
     Класс для асинхронного чтения и записи данных в JSON-файлы.
     Обеспечивает безопасность при одновременном доступе.
+    Данные хранятся в памяти и перечитываются с диска, только если файл изменили извне.
     """
 
+    # Содержимое нового пустого файла хранилища
+    EMPTY_FILE = b"[]"
+
     def __init__(self, filepath: str):
         """
         Инициализирует объект JSONDataStore.
@@ -19,20 +56,143 @@ class JSONDataStore:
         """
         self.filepath = filepath
         self.lock = asyncio.Lock()
+        # Содержимое файла в памяти (None, пока файл не прочитан)
+        self._data: Optional[List[Dict[str, Any]]] = None
+        # Время изменения файла, соответствующее данным в памяти
+        self._mtime_ns: int = 0
+        # Когда последний раз проверялось время изменения файла (time.monotonic)
+        self._checked_at: float = 0.0
+        # Индексы по уникальным полям: имя поля -> {значение: запись}
+        self._indexes: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        # Номер версии данных: увеличивается, когда данные в памяти заменяются целиком
+        # (перечитывание файла или полная запись); по нему производные индексы понимают,
+        # что их нужно перестроить
+        self.generation = 0
+        # Собственный поток для файловых операций: они выполняются по очереди
+        # и не занимают общий пул потоков цикла событий
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="json-store")
         # Создаём файл, если он не существует
         if not os.path.exists(self.filepath):
-            with open(self.filepath, 'w', encoding='utf-8') as f:
-                json.dump([], f)
+            with open(self.filepath, 'wb') as f:
+                f.write(self.EMPTY_FILE)
 
     async def read_data(self) -> List[Dict[str, Any]]:
         """
-        Асинхронно читает данные из JSON-файла.
+        Возвращает данные хранилища; JSON-файл читается при первом обращении
+        и повторно - только если он был изменён извне.
 
         :return: Список словарей, представляющих данные в файле.
         """
-        async with self.lock:
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, self._read_file)
+        if self._data is None or self._is_stale():
+            async with self.lock:
+                if self._data is None or self._file_changed():
+                    self._set_data(await self._run_io(self._read_file))
+        return self._data
+
+    async def get_by_key(self, key: str, value: Any) -> Optional[Dict[str, Any]]:
+        """
+        Находит запись по значению уникального поля через индекс в памяти.
+        Индекс строится при первом поиске по полю и сбрасывается при изменении данных.
+
+        :param key: Имя уникального поля (например, "code" или "request_id").
+        :param value: Искомое значение поля.
+        :return: Словарь записи или None, если запись не найдена.
+        """
+        await self.read_data()
+        return self._index(key).get(value)
+
+    async def preload(self, *keys: str) -> None:
+        """
+        Загружает данные и строит индексы по указанным полям заранее,
+        чтобы первый поиск не ждал чтения файла.
+
+        :param keys: Имена уникальных полей для индексации.
+        """
+        await self.read_data()
+        for key in keys:
+            self._index(key)
+
+    async def iter_filtered(
+        self, predicate: Callable[[Dict[str, Any]], bool]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Перебирает записи, удовлетворяющие условию, без построения промежуточного списка.
+
+        :param predicate: Функция, возвращающая True для нужных записей.
+        :return: Асинхронный итератор по подходящим записям.
+        """
+        for record in await self.read_data():
+            if predicate(record):
+                yield record
+
+    async def _run_io(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполняет синхронную файловую операцию в потоке хранилища.
+
+        :param func: Синхронная функция.
+        :param args: Аргументы функции.
+        :return: Результат функции.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _index(self, key: str) -> Dict[Any, Dict[str, Any]]:
+        """
+        Возвращает индекс по полю, строя его при первом обращении.
+        Вызывается, когда данные уже загружены в память.
+
+        :param key: Имя уникального поля.
+        :return: Словарь {значение поля: запись}.
+        """
+        index = self._indexes.get(key)
+        if index is None:
+            index = {record[key]: record for record in self._data if key in record}
+            self._indexes[key] = index
+        return index
+
+    def _index_record(self, record: Dict[str, Any]) -> None:
+        """
+        Добавляет запись в уже построенные индексы.
+
+        :param record: Словарь записи.
+        """
+        for key, index in self._indexes.items():
+            if key in record:
+                index[record[key]] = record
+
+    def _set_data(self, data: List[Dict[str, Any]]) -> None:
+        """
+        Заменяет данные в памяти и сбрасывает построенные по ним индексы.
+
+        :param data: Новый список записей хранилища.
+        """
+        self._data = data
+        self._indexes = {}
+        self.generation += 1
+
+    def _is_stale(self) -> bool:
+        """
+        Проверяет, изменился ли файл на диске после последнего чтения или записи.
+        Внешние изменения замечаются с задержкой до STALE_CHECK_INTERVAL секунд.
+
+        :return: True если данные в памяти устарели, иначе False.
+        """
+        # stat - системный вызов в потоке цикла событий, поэтому не чаще раза в STALE_CHECK_INTERVAL
+        now = time.monotonic()
+        if now - self._checked_at < STALE_CHECK_INTERVAL:
+            return False
+        self._checked_at = now
+        return self._file_changed()
+
+    def _file_changed(self) -> bool:
+        """
+        Сравнивает время изменения файла на диске с временем, соответствующим данным в памяти.
+
+        :return: True если файл изменён, иначе False.
+        """
+        try:
+            return os.stat(self.filepath).st_mtime_ns != self._mtime_ns
+        except FileNotFoundError:
+            return False
 
     def _read_file(self) -> List[Dict[str, Any]]:
         """
@@ -40,9 +200,10 @@ class JSONDataStore:
 
         :return: Список словарей, представляющих данные в файле.
         """
-        with open(self.filepath, 'r', encoding='utf-8') as f:
+        with open(self.filepath, 'rb') as f:
+            self._mtime_ns = os.fstat(f.fileno()).st_mtime_ns
             try:
-                data = json.load(f)
+                data = _json_loads(f.read())
                 if isinstance(data, list):
                     return data
                 else:
@@ -59,8 +220,102 @@ class JSONDataStore:
         :param data: Список словарей, которые необходимо записать в файл.
         """
         async with self.lock:
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self._write_file, data)
+            self._set_data(data)
+            await self._persist(data)
+
+    async def mutate(self, fn: Callable[[List[Dict[str, Any]]], bool]) -> bool:
+        """
+        Изменяет данные на месте и сохраняет их за одно удержание блокировки.
+
+        :param fn: Функция, изменяющая список записей; возвращает True, если данные изменены.
+        :return: Результат fn.
+        """
+        await self.read_data()
+        async with self.lock:
+            data = self._data
+            changed = fn(data)
+            if changed:
+                self._set_data(data)
+                await self._persist(data)
+            return changed
+
+    async def update_by_key(self, key: str, value: Any, fn: Callable[[Dict[str, Any]], bool]) -> bool:
+        """
+        Изменяет запись, найденную по значению уникального поля, и сохраняет данные.
+
+        :param key: Имя уникального поля.
+        :param value: Значение поля искомой записи.
+        :param fn: Функция, изменяющая запись (но не её индексируемые поля);
+                   возвращает True, если запись изменена.
+        :return: True если запись найдена и изменена, иначе False.
+        """
+        await self.read_data()
+        async with self.lock:
+            record = self._index(key).get(value)
+            if record is None or not fn(record):
+                return False
+            # Индексируемые поля не менялись - построенные индексы остаются актуальными
+            await self._persist(self._data)
+            return True
+
+    async def upsert(self, key: str, record: Dict[str, Any]) -> bool:
+        """
+        Заменяет запись с тем же значением уникального поля или добавляет новую.
+
+        :param key: Имя уникального поля.
+        :param record: Словарь записи; должен содержать поле key.
+        :return: True если запись добавлена, False если существующая запись заменена.
+        """
+        await self.read_data()
+        async with self.lock:
+            _, inserted = self._upsert_record(key, record)
+            await self._persist(self._data)
+            return inserted
+
+    def _upsert_record(self, key: str, record: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Заменяет или добавляет запись в данных в памяти и обновляет индексы.
+        Вызывается под блокировкой, когда данные уже загружены.
+
+        :param key: Имя уникального поля.
+        :param record: Словарь записи; должен содержать поле key.
+        :return: Кортеж (запись в хранилище, True если запись добавлена).
+        """
+        existing = self._index(key).get(record[key])
+        if existing is not None:
+            existing.clear()
+            existing.update(record)
+            record = existing
+        else:
+            self._data.append(record)
+        self._index_record(record)
+        return record, existing is None
+
+    async def _persist(self, data: List[Dict[str, Any]]) -> None:
+        """
+        Сохраняет данные на диск. Вызывается под блокировкой.
+
+        :param data: Список словарей, которые необходимо записать в файл.
+        """
+        await self._run_io(self._write_file, data)
+
+    async def append(self, record: Dict[str, Any]) -> None:
+        """
+        Добавляет запись в конец хранилища.
+
+        :param record: Словарь, который необходимо добавить.
+        """
+        await self.read_data()
+        async with self.lock:
+            self._data.append(record)
+            self._index_record(record)
+            await self._persist(self._data)
+
+    async def close(self) -> None:
+        """
+        Завершает поток файловых операций хранилища.
+        """
+        self._executor.shutdown(wait=True)
 
     def _write_file(self, data: List[Dict[str, Any]]) -> None:
         """
@@ -68,5 +323,391 @@ class JSONDataStore:
 
         :param data: Список словарей, которые необходимо записать в файл.
         """
-        with open(self.filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        self._write_payload(self._dump(data))
+
+    @staticmethod
+    def _dump(data: List[Dict[str, Any]]) -> bytes:
+        """
+        Сериализует данные в JSON (UTF-8).
+
+        :param data: Список словарей для сериализации.
+        :return: JSON-представление данных в байтах.
+        """
+        return _json_dumps(data)
+
+    def _write_payload(self, payload: bytes) -> None:
+        """
+        Синхронно записывает уже сериализованные данные в JSON-файл.
+
+        :param payload: JSON-представление данных в байтах.
+        """
+        # Пишем во временный файл одним буферизованным вызовом и атомарно подменяем основной,
+        # чтобы сбой во время записи не оставил повреждённый JSON
+        tmp_path = self.filepath + ".tmp"
+        with open(tmp_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.filepath)
+        self._mtime_ns = os.stat(self.filepath).st_mtime_ns
+
+
+class BatchingJSONStore(JSONDataStore):
+    """
+    JSONDataStore с отложенной записью: первое изменение планирует сброс через flush_interval секунд,
+    и все изменения, пришедшие за это время, попадают на диск одной записью.
+    """
+
+    def __init__(self, filepath: str, flush_interval: float = FLUSH_DELAY):
+        """
+        Инициализирует объект BatchingJSONStore.
+
+        :param filepath: Путь к JSON-файлу.
+        :param flush_interval: Задержка сброса изменений на диск (в секундах).
+        """
+        super().__init__(filepath)
+        self.flush_interval = flush_interval
+        # Есть ли в памяти изменения, ещё не записанные на диск
+        self._dirty = False
+        # Запланированный сброс на диск (None, если сброс не запланирован)
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _file_changed(self) -> bool:
+        """
+        Несброшенные изменения в памяти новее файла, поэтому он не перечитывается.
+
+        :return: True если файл изменён и данные в памяти устарели, иначе False.
+        """
+        return not self._dirty and super()._file_changed()
+
+    async def write_data(self, data: List[Dict[str, Any]]) -> None:
+        """
+        Запоминает данные для записи; на диск они попадут при ближайшем сбросе.
+
+        :param data: Список словарей, которые необходимо записать в файл.
+        """
+        self._set_data(data)
+        self._mark_dirty()
+
+    async def _persist(self, data: List[Dict[str, Any]]) -> None:
+        """
+        Откладывает запись до ближайшего сброса.
+
+        :param data: Список словарей, которые необходимо записать в файл.
+        """
+        self._mark_dirty()
+
+    def _mark_dirty(self) -> None:
+        """
+        Отмечает данные как изменённые и планирует сброс, если он ещё не запланирован.
+        """
+        self._dirty = True
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        """
+        Однократный отложенный сброс изменений на диск.
+        """
+        await asyncio.sleep(self.flush_interval)
+        # Изменения, пришедшие во время записи, запланируют следующий сброс
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Не удалось записать данные в {self.filepath}: {e}")
+            self._mark_dirty()
+
+    async def flush(self) -> None:
+        """
+        Записывает накопленные изменения на диск, если они есть.
+        """
+        async with self.lock:
+            await self._flush_locked()
+
+    async def _flush_locked(self) -> None:
+        """
+        Записывает накопленные изменения на диск. Вызывается под блокировкой.
+        """
+        if not self._dirty:
+            return
+        # Сериализуем в потоке цикла событий, чтобы получить согласованный снимок данных
+        payload = self._dump(self._data)
+        self._dirty = False
+        try:
+            await self._run_io(self._write_payload, payload)
+        except Exception:
+            # Запись не удалась - повторим при следующем сбросе
+            self._dirty = True
+            raise
+
+    async def close(self) -> None:
+        """
+        Отменяет запланированный сброс и записывает накопленные изменения на диск.
+        """
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        await super().close()
+
+
+class JSONLDataStore(BatchingJSONStore):
+    """
+    Хранилище в формате JSON Lines (одна запись на строку).
+    Новые записи дописываются в конец файла одной строкой, а не перезаписывают его целиком;
+    полная перезапись (например, при смене статуса) выполняется отложенно, как в BatchingJSONStore.
+    """
+
+    EMPTY_FILE = b""
+
+    def __init__(self, filepath: str, flush_interval: float = FLUSH_DELAY, legacy_path: Optional[str] = None):
+        """
+        Инициализирует объект JSONLDataStore.
+
+        :param filepath: Путь к файлу JSON Lines.
+        :param flush_interval: Задержка сброса полной перезаписи на диск (в секундах).
+        :param legacy_path: Путь к файлу прежнего формата (JSON-массив). Если файла JSON Lines
+                            ещё нет или он пуст, а старый файл есть, он переносится на новое место
+                            и переписывается в JSON Lines при первой записи.
+        """
+        if (
+            legacy_path and legacy_path != filepath and os.path.exists(legacy_path)
+            and (not os.path.exists(filepath) or os.path.getsize(filepath) == 0)
+        ):
+            os.replace(legacy_path, filepath)
+            logger.info(f"Файл {legacy_path} перенесён в {filepath}.")
+        super().__init__(filepath, flush_interval)
+        # Файл нужно переписать целиком перед дозаписью строк: он в старом формате (JSON-массив)
+        # или обрывается на незавершённой строке, к которой дописанная строка приклеилась бы
+        self._needs_rewrite = False
+        # Строки, ожидающие дозаписи, и задача, которая их записывает
+        self._pending_lines: List[bytes] = []
+        self._line_writer: Optional[asyncio.Task] = None
+
+    def _file_changed(self) -> bool:
+        """
+        Пока дописываются строки, файл меняется самим хранилищем, а время его изменения
+        запоминается только после fsync; перечитывание в этот момент потеряло бы записи,
+        ещё стоящие в очереди.
+
+        :return: True если файл изменён извне и данные в памяти устарели, иначе False.
+        """
+        if self._line_writer is not None or self._pending_lines:
+            return False
+        return super()._file_changed()
+
+    def _read_file(self) -> List[Dict[str, Any]]:
+        """
+        Синхронно читает записи из файла JSON Lines.
+        Файл в старом формате JSON-массива тоже читается и будет переписан при следующем сбросе.
+
+        :return: Список словарей, представляющих записи в файле.
+        """
+        with open(self.filepath, 'rb', buffering=READ_BUFFER_SIZE) as f:
+            self._mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+            if f.peek(4096).lstrip().startswith(b"["):
+                self._needs_rewrite = True
+                try:
+                    data = _json_loads(f.read())
+                except json.JSONDecodeError:
+                    data = None
+                return self._collect(iter(data if isinstance(data, list) else []))
+            self._needs_rewrite = False
+            # Файл разбирается построчно, не загружаясь в память целиком
+            return self._collect(self._iter_records(f))
+
+    def _iter_records(self, f: BinaryIO) -> Iterator[Dict[str, Any]]:
+        """
+        Построчно разбирает записи файла, пропуская пустые и повреждённые строки.
+        Последняя строка без перевода строки (оборванная сбоем дозапись) помечает файл
+        для полной перезаписи.
+
+        :param f: Файл, открытый в двоичном режиме.
+        :return: Итератор по записям.
+        """
+        for line in f:
+            if not line.endswith(b"\n"):
+                self._needs_rewrite = True
+            if not line.strip():
+                continue
+            try:
+                yield _json_loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Пропущена повреждённая строка в {self.filepath}.")
+
+    def _collect(self, records: Iterator[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Собирает прочитанные записи в список данных хранилища.
+
+        :param records: Итератор по записям файла.
+        :return: Список записей.
+        """
+        return list(records)
+
+    @staticmethod
+    def _dump(data: List[Dict[str, Any]]) -> bytes:
+        """
+        Сериализует записи в формат JSON Lines.
+
+        :param data: Список словарей для сериализации.
+        :return: Содержимое файла в байтах.
+        """
+        return b"".join(_json_dumps_line(record) + b"\n" for record in data)
+
+    def _write_payload(self, payload: bytes) -> None:
+        """
+        Атомарно перезаписывает файл целиком (см. JSONDataStore._write_payload).
+
+        :param payload: Содержимое файла в байтах.
+        """
+        super()._write_payload(payload)
+        self._needs_rewrite = False
+
+    async def append(self, record: Dict[str, Any]) -> None:
+        """
+        Добавляет запись, дописывая в конец файла одну строку.
+
+        :param record: Словарь, который необходимо добавить.
+        """
+        await self.read_data()
+        async with self.lock:
+            self._data.append(record)
+            self._index_record(record)
+            if self._dirty or self._needs_rewrite:
+                # Файл всё равно будет переписан целиком при ближайшем сбросе
+                self._mark_dirty()
+                return
+            writer = self._queue_line(_json_dumps_line(record) + b"\n")
+        await asyncio.shield(writer)
+
+    async def flush(self) -> None:
+        """
+        Дожидается дозаписи строк и записывает накопленные изменения на диск.
+        """
+        async with self.lock:
+            # Иначе строка, дописанная после полной перезаписи, продублировала бы запись
+            if self._line_writer is not None:
+                await asyncio.shield(self._line_writer)
+            await self._flush_locked()
+
+    def _queue_line(self, line: bytes) -> asyncio.Task:
+        """
+        Ставит строку в очередь на дозапись. Строки, накопившиеся, пока идёт предыдущая
+        запись, дописываются вместе - одним вызовом write и одним fsync.
+        Вызывается под блокировкой.
+
+        :param line: Сериализованная запись с завершающим переводом строки.
+        :return: Задача записи; завершается, когда строка записана на диск.
+        """
+        self._pending_lines.append(line)
+        if self._line_writer is None:
+            self._line_writer = asyncio.get_running_loop().create_task(self._write_lines())
+        return self._line_writer
+
+    async def _write_lines(self) -> None:
+        """
+        Дописывает в файл накопленные строки, пока очередь не опустеет.
+        Ошибка дозаписи не передаётся вызывающим: записи уже в памяти и будут сохранены
+        полной перезаписью файла, как и любые другие несброшенные изменения.
+        """
+        try:
+            while self._pending_lines:
+                lines, self._pending_lines = self._pending_lines, []
+                await self._run_io(self._append_line, b"".join(lines))
+        except Exception as e:
+            logger.error(f"Не удалось дописать строки в {self.filepath}, файл будет перезаписан целиком: {e}")
+            self._pending_lines = []
+            self._mark_dirty()
+        finally:
+            self._line_writer = None
+
+    def _append_line(self, line: bytes) -> None:
+        """
+        Синхронно дописывает строки в конец файла.
+
+        :param line: Сериализованные записи, каждая с завершающим переводом строки.
+        """
+        with open(self.filepath, 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+            self._mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+
+
+class KeyedJSONLStore(JSONLDataStore):
+    """
+    Хранилище JSON Lines с уникальным полем записей (например, "user_id").
+    Изменённая запись дописывается в конец файла новой строкой, а при чтении побеждает последняя
+    строка для каждого значения поля. Когда устаревших строк становится больше, чем актуальных,
+    файл уплотняется полной перезаписью при ближайшем сбросе.
+    """
+
+    def __init__(
+        self, filepath: str, key: str, flush_interval: float = FLUSH_DELAY, legacy_path: Optional[str] = None
+    ):
+        """
+        Инициализирует объект KeyedJSONLStore.
+
+        :param filepath: Путь к файлу JSON Lines.
+        :param key: Имя уникального поля записей.
+        :param flush_interval: Задержка сброса полной перезаписи на диск (в секундах).
+        :param legacy_path: Путь к файлу прежнего формата (JSON-массив), см. JSONLDataStore.
+        """
+        super().__init__(filepath, flush_interval, legacy_path)
+        self.key = key
+        # Количество строк в файле, перекрытых более поздними версиями тех же записей
+        self._stale_lines = 0
+
+    def _collect(self, records: Iterator[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Оставляет для каждого значения ключа последнюю версию записи; устаревшие версии
+        отбрасываются по ходу чтения и не накапливаются в памяти.
+
+        :param records: Итератор по записям файла.
+        :return: Список актуальных записей.
+        """
+        latest: Dict[Any, Dict[str, Any]] = {}
+        keyless = []
+        total = 0
+        for record in records:
+            total += 1
+            if self.key in record:
+                latest[record[self.key]] = record
+            else:
+                keyless.append(record)
+        result = list(latest.values()) + keyless
+        self._stale_lines = total - len(result)
+        return result
+
+    def _write_payload(self, payload: bytes) -> None:
+        """
+        Атомарно перезаписывает файл целиком, убирая устаревшие строки.
+
+        :param payload: Содержимое файла в байтах.
+        """
+        super()._write_payload(payload)
+        self._stale_lines = 0
+
+    async def upsert(self, key: str, record: Dict[str, Any]) -> bool:
+        """
+        Заменяет или добавляет запись, дописывая её новую версию в конец файла.
+
+        :param key: Имя уникального поля (должно совпадать с ключом хранилища).
+        :param record: Словарь записи; должен содержать поле key.
+        :return: True если запись добавлена, False если существующая запись заменена.
+        """
+        await self.read_data()
+        async with self.lock:
+            stored, inserted = self._upsert_record(key, record)
+            if self._dirty or self._needs_rewrite:
+                # Файл всё равно будет переписан целиком при ближайшем сбросе
+                self._mark_dirty()
+                return inserted
+            writer = self._queue_line(_json_dumps_line(stored) + b"\n")
+            if not inserted:
+                self._stale_lines += 1
+                if self._stale_lines > max(COMPACT_MIN_STALE_LINES, len(self._data)):
+                    self._mark_dirty()
+        await asyncio.shield(writer)
+        return inserted
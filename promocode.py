@@ -8,7 +8,7 @@ from dataclasses import dataclass, asdict
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Promocode:
     """
     Класс для представления промокода.
@@ -55,11 +55,10 @@ class PromocodeService:
         :param code: Код промокода.
         :return: Объект Promocode или None, если промокод не найден или не активен.
         """
-        promocodes = await self.promocodes_store.read_data()
-        for promo_data in promocodes:
-            if promo_data["code"] == code and promo_data.get("active", True):
-                logger.debug(f"Promocode {code} найден и активен.")
-                return Promocode.from_dict(promo_data)
+        promo_data = await self.promocodes_store.get_by_key("code", code)
+        if promo_data is not None and promo_data.get("active", True):
+            logger.debug(f"Promocode {code} найден и активен.")
+            return Promocode.from_dict(promo_data)
         logger.debug(f"Promocode {code} не найден или не активен.")
         return None
 
@@ -70,13 +69,10 @@ class PromocodeService:
         :param code: Код промокода.
         :return: True если промокод успешно применён, иначе False.
         """
-        promocodes = await self.promocodes_store.read_data()
-        for promo_data in promocodes:
-            if promo_data["code"] == code and promo_data.get("active", True):
-                promo_data["active"] = False  # Деактивируем промокод после использования
-                await self.promocodes_store.write_data(promocodes)
-                logger.info(f"Promocode {code} успешно применён и деактивирован.")
-                return True
+        # Деактивируем промокод после использования
+        if await self.promocodes_store.update_by_key("code", code, self._deactivate):
+            logger.info(f"Promocode {code} успешно применён и деактивирован.")
+            return True
         logger.warning(f"Не удалось применить промокод {code}. Он может быть неактивным или не существовать.")
         return False
 
@@ -88,15 +84,13 @@ class PromocodeService:
         :param duration_days: Длительность действия промокода в днях.
         :return: True если промокод успешно добавлен, иначе False.
         """
-        promocodes = await self.promocodes_store.read_data()
         # Проверяем уникальность кода
-        if any(promo["code"] == code for promo in promocodes):
+        if await self.promocodes_store.get_by_key("code", code) is not None:
             logger.warning(f"Попытка добавить существующий промокод {code}.")
             return False
 
         new_promocode = Promocode(code=code, duration_days=duration_days)
-        promocodes.append(new_promocode.to_dict())
-        await self.promocodes_store.write_data(promocodes)
+        await self.promocodes_store.append(new_promocode.to_dict())
         logger.info(f"Новый промокод {code} добавлен с длительностью {duration_days} дней.")
         return True
 
@@ -107,12 +101,14 @@ class PromocodeService:
         :param code: Код промокода для удаления.
         :return: True если промокод успешно удалён, иначе False.
         """
-        promocodes = await self.promocodes_store.read_data()
-        updated_promocodes = [promo for promo in promocodes if promo["code"] != code]
-        if len(updated_promocodes) == len(promocodes):
+        def remove(promocodes: List[Dict[str, Any]]) -> bool:
+            count = len(promocodes)
+            promocodes[:] = [promo for promo in promocodes if promo["code"] != code]
+            return len(promocodes) != count
+
+        if not await self.promocodes_store.mutate(remove):
             logger.warning(f"Попытка удалить несуществующий промокод {code}.")
             return False
-        await self.promocodes_store.write_data(updated_promocodes)
         logger.info(f"Промокод {code} успешно удалён.")
         return True
 
@@ -132,12 +128,21 @@ class PromocodeService:
         :param code: Код промокода.
         :return: True если промокод успешно деактивирован, иначе False.
         """
-        promocodes = await self.promocodes_store.read_data()
-        for promo_data in promocodes:
-            if promo_data["code"] == code and promo_data.get("active", True):
-                promo_data["active"] = False
-                await self.promocodes_store.write_data(promocodes)
-                logger.info(f"Promocode {code} деактивирован.")
-                return True
+        if await self.promocodes_store.update_by_key("code", code, self._deactivate):
+            logger.info(f"Promocode {code} деактивирован.")
+            return True
         logger.warning(f"Не удалось деактивировать промокод {code}. Он может быть уже неактивным или не существовать.")
         return False
+
+    @staticmethod
+    def _deactivate(promo_data: Dict[str, Any]) -> bool:
+        """
+        Деактивирует запись промокода, если она ещё активна.
+
+        :param promo_data: Словарь промокода из хранилища.
+        :return: True если промокод был активен и деактивирован, иначе False.
+        """
+        if not promo_data.get("active", True):
+            return False
+        promo_data["active"] = False
+        return True
@@ -0,0 +1,119 @@
+# rate_limiter.py
+
+import asyncio
+import logging
+import time
+from typing import Dict, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты по алгоритму "корзина токенов".
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        Инициализирует корзину токенов.
+
+        :param rate: Скорость пополнения (токенов в секунду).
+        :param capacity: Максимальное количество токенов (допустимый всплеск).
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """
+        Забирает один токен, ожидая его появления при необходимости.
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class OutboundLimiter(BaseRequestMiddleware):
+    """
+    Middleware сессии бота, ограничивающее частоту исходящих сообщений в пределах лимитов Telegram:
+    общий лимит на все чаты и более строгий лимит для каждого группового чата.
+    При ответе 429 запрос повторяется после указанного Telegram retry_after.
+    """
+
+    def __init__(self, global_rate: float = 30, group_rate_per_minute: float = 20, max_retries: int = 3) -> None:
+        """
+        Инициализирует ограничитель исходящих сообщений.
+
+        :param global_rate: Максимум сообщений в секунду по всем чатам.
+        :param group_rate_per_minute: Максимум сообщений в минуту в один групповой чат.
+        :param max_retries: Количество повторов запроса после ответа 429.
+        """
+        self._global = TokenBucket(global_rate, global_rate)
+        self.group_rate_per_minute = group_rate_per_minute
+        self.max_retries = max_retries
+        # Корзины групповых чатов: chat_id -> TokenBucket
+        self._groups: Dict[Union[int, str], TokenBucket] = {}
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            # Служебные запросы (getUpdates и т.п.) не ограничиваются
+            return await make_request(bot, method)
+
+        for attempt in range(self.max_retries + 1):
+            if self._is_group(chat_id):
+                await self._group_bucket(chat_id).acquire()
+            await self._global.acquire()
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(
+                    "Превышен лимит Telegram для чата %s, повтор через %s сек.", chat_id, e.retry_after
+                )
+                await asyncio.sleep(e.retry_after)
+
+    @staticmethod
+    def _is_group(chat_id: Union[int, str]) -> bool:
+        """
+        Проверяет, является ли чат групповым (группа, супергруппа или канал).
+
+        :param chat_id: Идентификатор чата или @username канала.
+        :return: True для групповых чатов, иначе False.
+        """
+        if isinstance(chat_id, str):
+            return chat_id.startswith("@") or chat_id.startswith("-")
+        return chat_id < 0
+
+    def _group_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        """
+        Возвращает корзину токенов группового чата, создавая её при первом обращении.
+
+        :param chat_id: Идентификатор группового чата.
+        :return: Объект TokenBucket.
+        """
+        bucket = self._groups.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.group_rate_per_minute / 60, self.group_rate_per_minute)
+            self._groups[chat_id] = bucket
+        return bucket
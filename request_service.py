@@ -2,6 +2,7 @@
 
 import logging
 from typing import Optional, List, Dict, Any
+import os
 import uuid
 from dataclasses import dataclass
 
@@ -10,6 +11,8 @@ from request import Request  # Импортируем класс Request из re
 
 logger = logging.getLogger(__name__)
 
+UUID_BATCH_SIZE = 64  # Сколько идентификаторов заявок генерировать за одно обращение к os.urandom
+
 class RequestService:
     """
     Сервис для управления заявками пользователей на оформление подписки.
@@ -19,11 +22,36 @@ class RequestService:
         """
         Инициализирует сервис заявок с указанным хранилищем данных.
 
-        :param requests_store: Объект JSONDataStore для работы с requests.json.
+        :param requests_store: Объект JSONDataStore для работы с requests.jsonl.
         """
         self.requests_store = requests_store
+        # Индекс заявок в статусе "pending"; строится при первом обращении
+        self._pending: Optional[Dict[str, Request]] = None
+        # Версия данных хранилища, по которой построен индекс
+        self._pending_generation = 0
+        # Заранее сгенерированные идентификаторы заявок
+        self._uuid_pool: List[str] = []
         logger.info("RequestService initialized.")
 
+    async def load_pending_index(self) -> Dict[str, Request]:
+        """
+        Возвращает индекс заявок в статусе "pending", при необходимости загружая его из хранилища.
+        Индекс перестраивается, если хранилище перечитало файл, изменённый извне.
+
+        :return: Словарь {request_id: Request} ожидающих обработки заявок.
+        """
+        await self.requests_store.read_data()
+        if self._pending is None or self._pending_generation != self.requests_store.generation:
+            self._pending = {
+                req["request_id"]: Request.from_dict(req)
+                async for req in self.requests_store.iter_filtered(
+                    lambda req: req.get("status") == "pending"
+                )
+            }
+            self._pending_generation = self.requests_store.generation
+            logger.debug(f"Индекс ожидающих заявок построен: {len(self._pending)} шт.")
+        return self._pending
+
     async def create_request(self, request: Request) -> bool:
         """
         Создаёт новую заявку и сохраняет её в хранилище.
@@ -32,9 +60,9 @@ class RequestService:
         :return: True если успешно, иначе False.
         """
         try:
-            requests = await self.requests_store.read_data()
-            requests.append(request.to_dict())
-            await self.requests_store.write_data(requests)
+            await self.requests_store.append(request.to_dict())
+            if self._pending is not None and request.status == "pending":
+                self._pending[request.request_id] = request
             logger.info(f"Заявка {request.request_id} от пользователя {request.user_id} успешно создана.")
             return True
         except Exception as e:
@@ -49,11 +77,10 @@ class RequestService:
         :return: Объект Request или None, если заявка не найдена.
         """
         try:
-            requests = await self.requests_store.read_data()
-            for req_data in requests:
-                if req_data["request_id"] == request_id:
-                    logger.debug(f"Заявка {request_id} найдена.")
-                    return Request.from_dict(req_data)
+            req_data = await self.requests_store.get_by_key("request_id", request_id)
+            if req_data is not None:
+                logger.debug(f"Заявка {request_id} найдена.")
+                return Request.from_dict(req_data)
             logger.debug(f"Заявка {request_id} не найдена.")
             return None
         except Exception as e:
@@ -69,15 +96,20 @@ class RequestService:
         :return: True если успешно обновлено, иначе False.
         """
         try:
-            requests = await self.requests_store.read_data()
-            for req_data in requests:
-                if req_data["request_id"] == request_id:
-                    req_data["status"] = new_status
-                    await self.requests_store.write_data(requests)
-                    logger.info(f"Статус заявки {request_id} обновлён на {new_status}.")
-                    return True
-            logger.warning(f"Заявка {request_id} не найдена для обновления статуса.")
-            return False
+            def set_status(req_data: Dict[str, Any]) -> bool:
+                req_data["status"] = new_status
+                return True
+
+            if not await self.requests_store.update_by_key("request_id", request_id, set_status):
+                logger.warning(f"Заявка {request_id} не найдена для обновления статуса.")
+                return False
+            if self._pending is not None:
+                if new_status == "pending":
+                    self._pending[request_id] = await self.get_request(request_id)
+                else:
+                    self._pending.pop(request_id, None)
+            logger.info(f"Статус заявки {request_id} обновлён на {new_status}.")
+            return True
         except Exception as e:
             logger.error(f"Ошибка при обновлении статуса заявки {request_id}: {e}")
             return False
@@ -90,11 +122,20 @@ class RequestService:
         :return: Список объектов Request.
         """
         try:
-            requests = await self.requests_store.read_data()
+            if status_filter == "pending":
+                pending_requests = list((await self.load_pending_index()).values())
+                logger.debug(f"Получено {len(pending_requests)} заявок с статусом 'pending' из индекса.")
+                return pending_requests
             if status_filter:
-                filtered_requests = [Request.from_dict(req) for req in requests if req.get("status") == status_filter]
+                filtered_requests = [
+                    Request.from_dict(req)
+                    async for req in self.requests_store.iter_filtered(
+                        lambda req: req.get("status") == status_filter
+                    )
+                ]
                 logger.debug(f"Получено {len(filtered_requests)} заявок с статусом '{status_filter}'.")
                 return filtered_requests
+            requests = await self.requests_store.read_data()
             all_requests = [Request.from_dict(req) for req in requests]
             logger.debug(f"Получено {len(all_requests)} всех заявок.")
             return all_requests
@@ -108,4 +149,10 @@ class RequestService:
 
         :return: Уникальный идентификатор заявки.
         """
-        return str(uuid.uuid4())
+        if not self._uuid_pool:
+            # Один системный вызов на UUID_BATCH_SIZE идентификаторов вместо вызова на каждую заявку
+            raw = os.urandom(16 * UUID_BATCH_SIZE)
+            self._uuid_pool = [
+                str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, len(raw), 16)
+            ]
+        return self._uuid_pool.pop()
@@ -1,9 +1,13 @@
  # vpn_service.py
 
+import asyncio
 import logging
-from datetime import datetime, timedelta, timezone
-from typing import Optional
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 
+import httpx
 from py3xui import AsyncApi, Client
 
 # Для aiogram 3.x импорт Bot по-прежнему доступен так:
@@ -14,26 +18,46 @@ from json_utils import JSONDataStore
 from promocode import PromocodeService
 from request_service import RequestService, Request
 from client import ClientData
+from expiry_scheduler import ExpiryScheduler
+from request import format_timestamp_ms
+from xui_session import XUIConnectionPool
 
 logger = logging.getLogger(__name__)
 
+MS_PER_DAY = 86_400_000     # Миллисекунд в сутках
 
+BROADCAST_CONCURRENCY = 25  # Максимум одновременно отправляемых сообщений при рассылке
+
+CLIENT_CACHE_TTL = 30.0     # Время жизни закэшированного клиента 3x-ui (в секундах)
+CLIENT_CACHE_SIZE = 4096    # Максимальное количество пользователей в кэше
+
+EXPIRY_REMINDER_TMPL = "⏰ Ваша подписка VPN закончится {expiry}. Продлите её, чтобы не потерять доступ."
+
+
+@dataclass(slots=True)
 class User:
     """
     Класс для представления пользователя VPN.
     """
-    def __init__(self, user_id: int, vpn_id: str):
-        self.user_id = user_id
-        self.vpn_id = vpn_id
+    user_id: int
+    vpn_id: str
+    # Email клиента в 3x-ui (строковый user_id); вычисляется один раз и не хранится в JSON
+    email: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.email = str(self.user_id)
 
-    def to_dict(self):
-        return {
-            "user_id": self.user_id,
-            "vpn_id": self.vpn_id
-        }
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Конвертирует объект User в словарь для хранения в JSON.
+        """
+        return {"user_id": self.user_id, "vpn_id": self.vpn_id}
 
     @staticmethod
-    def from_dict(data: dict):
+    def from_dict(data: Dict[str, Any]) -> 'User':
+        """
+        Создаёт объект User из словаря.
+        """
         return User(user_id=data["user_id"], vpn_id=data["vpn_id"])
 
 
@@ -65,10 +89,28 @@ class VPNService:
             use_tls_verify=False,
             logger=logging.getLogger("xui"),
         )
+        # Соединения с панелью переиспользуются между запросами (keep-alive)
+        self._xui_pool = XUIConnectionPool(self.api, config.xui.MAX_CONCURRENCY)
         self.promocode_service = promocode_service
         self.request_service = request_service
         self.inbound_id = config.xui.INBOUND_ID  # Единственный inbound ID
+        # Ограничение одновременных запросов к панели 3x-ui
+        self._api_semaphore = asyncio.Semaphore(config.xui.MAX_CONCURRENCY)
+        self.api_retries = config.xui.RETRIES
+        self.api_retry_delay = config.xui.RETRY_DELAY
+        self.relogin_interval = config.xui.RELOGIN_INTERVAL
+        self._relogin_task: Optional[asyncio.Task] = None
+        # Напоминания об окончании подписки (None, если отключены)
+        self.expiry_scheduler: Optional[ExpiryScheduler] = None
+        if config.EXPIRY_REMINDER_HOURS > 0:
+            self.expiry_scheduler = ExpiryScheduler(
+                int(config.EXPIRY_REMINDER_HOURS * 3_600_000), self._send_expiry_reminder
+            )
         self.bot = bot  # Сохраняем объект бота для отправки сообщений
+        # LRU-кэш клиентов 3x-ui: user_id -> (время получения, клиент или None)
+        self._client_cache: "OrderedDict[int, Tuple[float, Optional[Client]]]" = OrderedDict()
+        # Выполняющиеся запросы клиентов: user_id -> задача, общая для всех ожидающих
+        self._inflight: Dict[int, "asyncio.Task[Optional[Client]]"] = {}
         logger.info("VPNService initialized.")
 
     async def initialize(self) -> None:
@@ -76,25 +118,97 @@ class VPNService:
         Инициализирует сервис VPN и выполняет вход в API панели 3x-ui.
         """
         try:
-            await self.api.login()
+            # Панель может ещё перезапускаться: вход повторяется с экспоненциальной задержкой
+            await self._call_api(self.api.login)
             logger.info("Successfully logged into 3x-ui API.")
         except Exception as e:
             logger.error(f"Failed to login to 3x-ui API: {e}")
             raise
+        if self.relogin_interval > 0:
+            self._relogin_task = asyncio.create_task(self._relogin_loop())
+        if self.expiry_scheduler is not None:
+            await self._load_expiries()
+            self.expiry_scheduler.start()
+        # Прогреваем индексы пользователей и ожидающих заявок, чтобы первые запросы не читали файлы
+        await self.users_store.preload("user_id")
+        await self.request_service.load_pending_index()
+
+    async def close(self) -> None:
+        """
+        Сбрасывает накопленные изменения хранилищ на диск и закрывает соединения с 3x-ui.
+        """
+        if self._relogin_task is not None:
+            self._relogin_task.cancel()
+            await asyncio.gather(self._relogin_task, return_exceptions=True)
+        if self.expiry_scheduler is not None:
+            await self.expiry_scheduler.stop()
+        for store in self._stores():
+            await store.close()
+        await self._xui_pool.close()
+        logger.info("VPNService stopped, stores flushed.")
+
+    async def _relogin_loop(self) -> None:
+        """
+        Периодически выполняет повторный вход в 3x-ui, чтобы сессия панели не истекала.
+        """
+        while True:
+            await asyncio.sleep(self.relogin_interval)
+            try:
+                await self._call_api(self.api.login)
+                logger.info("3x-ui session refreshed.")
+            except Exception as e:
+                logger.error(f"Failed to refresh 3x-ui session: {e}")
+
+    async def _load_expiries(self) -> None:
+        """
+        Загружает время окончания подписок всех клиентов inbound в планировщик напоминаний.
+        """
+        try:
+            inbound = await self._call_api(self.api.inbound.get_by_id, self.inbound_id)
+        except Exception as e:
+            logger.error(f"Failed to load client expiry times: {e}")
+            return
+        self.expiry_scheduler.load(
+            (int(client.email), client.expiry_time)
+            for client in inbound.client_stats or []
+            if client.email.isdigit()
+        )
+
+    async def _send_expiry_reminder(self, user_id: int, expiry_ms: int) -> None:
+        """
+        Напоминает пользователю о скором окончании подписки.
+
+        :param user_id: ID пользователя.
+        :param expiry_ms: Время окончания подписки в миллисекундах.
+        """
+        # Срок могли изменить в панели в обход бота: сверяемся с актуальными данными 3x-ui
+        self.invalidate_client(user_id)
+        client = await self._get_client(user_id)
+        if client is None:
+            return
+        if client.expiry_time != expiry_ms:
+            self.expiry_scheduler.schedule(user_id, client.expiry_time)
+            return
+        await self.send_message_to_user(user_id, EXPIRY_REMINDER_TMPL.format(expiry=format_timestamp_ms(expiry_ms)))
+
+    def _stores(self) -> List[JSONDataStore]:
+        """
+        Возвращает список JSON-хранилищ, используемых сервисом.
+        """
+        return [self.users_store, self.promocodes_store, self.requests_store]
 
     async def get_user(self, user_id: int) -> Optional[User]:
         """
-        Получает пользователя по user_id из JSON-файла.
+        Получает пользователя по user_id из индекса хранилища в памяти.
 
         :param user_id: ID пользователя.
         :return: Объект User или None, если не найден.
         """
-        users = await self.users_store.read_data()
-        for user_data in users:
-            if user_data["user_id"] == user_id:
-                logger.debug(f"User {user_id} found in users.json.")
-                return User.from_dict(user_data)
-        logger.debug(f"User {user_id} not found in users.json.")
+        user_data = await self.users_store.get_by_key("user_id", user_id)
+        if user_data is not None:
+            logger.debug("User %s found in users.jsonl.", user_id)
+            return User.from_dict(user_data)
+        logger.debug("User %s not found in users.jsonl.", user_id)
         return None
 
     async def save_user(self, user: User) -> None:
@@ -103,17 +217,10 @@ class VPNService:
 
         :param user: Объект User для сохранения.
         """
-        users = await self.users_store.read_data()
-        for idx, user_data in enumerate(users):
-            if user_data["user_id"] == user.user_id:
-                users[idx] = user.to_dict()
-                await self.users_store.write_data(users)
-                logger.debug(f"User {user.user_id} updated in users.json.")
-                return
-        # Если пользователя нет, добавляем нового
-        users.append(user.to_dict())
-        await self.users_store.write_data(users)
-        logger.debug(f"User {user.user_id} added to users.json.")
+        if await self.users_store.upsert("user_id", user.to_dict()):
+            logger.debug("User %s added to users.jsonl.", user.user_id)
+        else:
+            logger.debug("User %s updated in users.jsonl.", user.user_id)
 
     async def is_client_exists(self, user_id: int) -> Optional[Client]:
         """
@@ -123,11 +230,11 @@ class VPNService:
         :return: Объект Client или None.
         """
         try:
-            client = await self.api.client.get_by_email(str(user_id))
+            client = await self._get_client(user_id)
             if client:
-                logger.debug(f"Client {user_id} exists in 3x-ui.")
+                logger.debug("Client %s exists in 3x-ui.", user_id)
             else:
-                logger.debug(f"Client {user_id} does not exist in 3x-ui.")
+                logger.debug("Client %s does not exist in 3x-ui.", user_id)
             return client
         except Exception as e:
             logger.error(f"Error checking client existence for {user_id}: {e}")
@@ -141,38 +248,104 @@ class VPNService:
         :return: Объект ClientData или None.
         """
         try:
-            client: Client = await self.api.client.get_by_email(str(user_id))
-            if client is None:
-                logger.debug(f"No client data found for user {user_id}.")
-                return None
-
-            limit_ip = client.limit_ip
-            max_devices = -1 if limit_ip == 0 else limit_ip
-            traffic_total = client.total
-            expiry_time = -1 if client.expiry_time == 0 else client.expiry_time
-
-            if traffic_total <= 0:
-                traffic_remaining = -1
-                traffic_total = -1
-            else:
-                traffic_remaining = traffic_total - (client.up + client.down)
-
-            traffic_used = client.up + client.down
-
-            client_data = ClientData(
-                max_devices=max_devices,
-                traffic_total=traffic_total,
-                traffic_remaining=traffic_remaining,
-                traffic_used=traffic_used,
-                traffic_up=client.up,
-                traffic_down=client.down,
-                expiry_time=expiry_time,
-            )
-            logger.debug(f"Retrieved client data for user {user_id}: {client_data}.")
-            return client_data
+            client = await self._get_client(user_id)
         except Exception as e:
             logger.error(f"Error retrieving client data for {user_id}: {e}")
             return None
+        if client is None:
+            logger.debug("No client data found for user %s.", user_id)
+            return None
+
+        up, down, total = client.up, client.down, client.total
+        traffic_used = up + down
+        has_quota = total > 0
+
+        client_data = ClientData(
+            max_devices=client.limit_ip or -1,
+            traffic_total=total if has_quota else -1,
+            traffic_remaining=total - traffic_used if has_quota else -1,
+            traffic_used=traffic_used,
+            traffic_up=up,
+            traffic_down=down,
+            expiry_time=client.expiry_time or -1,
+        )
+        logger.debug("Retrieved client data for user %s: %s.", user_id, client_data)
+        return client_data
+
+    async def _get_client(self, user_id: int) -> Optional[Client]:
+        """
+        Возвращает клиента 3x-ui по user_id, используя кэш с ограниченным временем жизни.
+        Ошибки API пробрасываются вызывающему коду и не кэшируются.
+
+        :param user_id: ID пользователя.
+        :return: Объект Client или None, если клиент не найден.
+        """
+        now = time.monotonic()
+        cached = self._client_cache.get(user_id)
+        if cached is not None and now - cached[0] < CLIENT_CACHE_TTL:
+            self._client_cache.move_to_end(user_id)
+            logger.debug("Client %s served from cache.", user_id)
+            return cached[1]
+
+        # Одновременные запросы одного клиента объединяются в один запрос к панели
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_client(user_id))
+            self._inflight[user_id] = task
+        # shield: отмена одного из ожидающих не прерывает запрос для остальных
+        return await asyncio.shield(task)
+
+    async def _fetch_client(self, user_id: int) -> Optional[Client]:
+        """
+        Запрашивает клиента 3x-ui и кэширует результат, если кэш не был сброшен во время запроса.
+
+        :param user_id: ID пользователя.
+        :return: Объект Client или None, если клиент не найден.
+        """
+        task = asyncio.current_task()
+        try:
+            client = await self._call_api(self.api.client.get_by_email, str(user_id))
+            if self._inflight.get(user_id) is task:
+                self._client_cache[user_id] = (time.monotonic(), client)
+                self._client_cache.move_to_end(user_id)
+                if len(self._client_cache) > CLIENT_CACHE_SIZE:
+                    self._client_cache.popitem(last=False)
+            return client
+        finally:
+            if self._inflight.get(user_id) is task:
+                del self._inflight[user_id]
+
+    async def _call_api(self, func: Callable[..., Awaitable[Any]], *args: Any, retry: bool = True) -> Any:
+        """
+        Вызывает метод API 3x-ui с ограничением числа одновременных запросов
+        и повтором с экспоненциальной задержкой при сетевых ошибках.
+
+        :param func: Асинхронный метод API.
+        :param args: Аргументы метода.
+        :param retry: Повторять ли запрос при сетевой ошибке.
+        :return: Результат метода.
+        """
+        attempts = self.api_retries + 1 if retry else 1
+        for attempt in range(attempts):
+            try:
+                async with self._api_semaphore:
+                    return await func(*args)
+            except httpx.TransportError as e:
+                if attempt == attempts - 1:
+                    raise
+                delay = self.api_retry_delay * 2 ** attempt
+                logger.warning(f"Сетевая ошибка при запросе к 3x-ui ({e}), повтор через {delay} сек.")
+                await asyncio.sleep(delay)
+
+    def invalidate_client(self, user_id: int) -> None:
+        """
+        Удаляет закэшированного клиента, чтобы следующий запрос получил его из 3x-ui.
+
+        :param user_id: ID пользователя.
+        """
+        self._client_cache.pop(user_id, None)
+        # Результат уже выполняющегося запроса может быть устаревшим и не должен попасть в кэш
+        self._inflight.pop(user_id, None)
 
     async def create_client(
         self,
@@ -188,17 +361,21 @@ class VPNService:
         """
         logger.info(f"Creating client for user {user.user_id} with {devices} devices for {duration} days.")
         new_client = Client(
-            email=str(user.user_id),
+            email=user.email,
             enable=enable,
             id=user.vpn_id,
             expiry_time=self._days_to_timestamp(duration),
             flow=flow,
             limit_ip=devices,
-            sub_id=self.subscription_prefix + str(user.user_id),
+            sub_id=self.subscription_prefix + user.email,
             total_gb=total_gb,
         )
         try:
-            await self.api.client.add(self.inbound_id, [new_client])
+            # Добавление не идемпотентно: при обрыве связи повтор мог бы создать конфликт
+            await self._call_api(self.api.client.add, self.inbound_id, [new_client], retry=False)
+            self.invalidate_client(user.user_id)
+            if self.expiry_scheduler is not None:
+                self.expiry_scheduler.schedule(user.user_id, new_client.expiry_time)
             logger.info(f"Successfully created client for user {user.user_id}.")
             return True
         except Exception as e:
@@ -215,15 +392,19 @@ class VPNService:
         enable: bool = True,
         flow: str = "xtls-rprx-vision",
         total_gb: int = 0,
+        client: Optional[Client] = None,
     ) -> bool:
         """
         Обновляет существующего клиента VPN через API 3x-ui.
+
+        :param client: Уже полученный объект клиента; если не передан, запрашивается из 3x-ui.
         """
         logger.info(f"Updating client for user {user.user_id} with {devices} devices for {duration} days.")
         try:
-            client: Client = await self.api.client.get_by_email(str(user.user_id))
             if client is None:
-                logger.debug(f"Client {user.user_id} not found for update.")
+                client = await self._get_client(user.user_id)
+            if client is None:
+                logger.debug("Client %s not found for update.", user.user_id)
                 return False
 
             if not replace_devices:
@@ -239,14 +420,27 @@ class VPNService:
 
             expiry_time = self._add_days_to_timestamp(expiry_time_to_use, duration)
 
-            client.enable = enable
-            client.expiry_time = expiry_time
-            client.flow = flow
-            client.limit_ip = devices
-            client.sub_id = self.subscription_prefix + str(user.user_id)
-            client.total_gb = total_gb
-
-            await self.api.client.update(self.inbound_id, client.id, client)
+            changes = {
+                # get_by_email возвращает строку статистики клиента: её id - номер строки,
+                # а не UUID клиента, по которому 3x-ui находит клиента при обновлении
+                "id": user.vpn_id,
+                "enable": enable,
+                "expiry_time": expiry_time,
+                "flow": flow,
+                "limit_ip": devices,
+                "sub_id": self.subscription_prefix + user.email,
+                "total_gb": total_gb,
+            }
+
+            # Копия вместо изменения на месте: закэшированный клиент остаётся нетронутым,
+            # если обновление в 3x-ui не удастся
+            updated_client = client.model_copy(update=changes)
+
+            await self._call_api(self.api.client.update, user.vpn_id, updated_client)
+            # Трафик и лимиты пересчитывает панель - следующий запрос получит их из 3x-ui
+            self.invalidate_client(user.user_id)
+            if self.expiry_scheduler is not None:
+                self.expiry_scheduler.schedule(user.user_id, expiry_time)
             logger.info(f"Successfully updated client for user {user.user_id}.")
             return True
         except Exception as e:
@@ -257,25 +451,57 @@ class VPNService:
         """
         Создаёт новую подписку для пользователя. Если пользователь уже существует, обновляет её.
         """
-        user = await self.get_user(user_id)
-        if not user:
-            user = User(user_id=user_id, vpn_id=f"vpn_{user_id}")
-            await self.save_user(user)
-            logger.debug(f"User {user_id} created and saved to users.json.")
-
-        client_exists = await self.is_client_exists(user.user_id)
-        if not client_exists:
-            success = await self.create_client(user, devices, duration)
-            return success
-        else:
-            success = await self.update_client(
+        # Пользователь ищется в памяти, клиент - в 3x-ui: выполняем оба запроса одновременно
+        user, client = await asyncio.gather(
+            self.get_user(user_id),
+            self.is_client_exists(user_id),
+        )
+        if not client:
+            return await self._provision(
+                user_id, user, lambda user: self.create_client(user, devices, duration)
+            )
+        return await self._provision(
+            user_id,
+            user,
+            lambda user: self.update_client(
                 user,
                 devices,
                 duration,
                 replace_devices=True,
                 replace_duration=True,
-            )
-            return success
+                client=client,
+            ),
+        )
+
+    async def _provision(
+        self,
+        user_id: int,
+        user: Optional[User],
+        provision: Callable[[User], Awaitable[bool]],
+    ) -> bool:
+        """
+        Выполняет обращение к 3x-ui для пользователя. Нового пользователя создаёт
+        и сохраняет одновременно с этим обращением, а не перед ним.
+
+        :param user_id: ID пользователя.
+        :param user: Найденный пользователь или None, если его ещё нет.
+        :param provision: Функция, выполняющая обращение к 3x-ui для пользователя.
+        :return: Результат provision.
+        """
+        if user is not None:
+            return await provision(user)
+        user = User(user_id=user_id, vpn_id=f"vpn_{user_id}")
+        # return_exceptions: ошибка сохранения не должна прерывать ожидание уже идущего
+        # обращения к 3x-ui, иначе вызывающий код не узнает, что подписка изменена
+        saved, success = await asyncio.gather(self.save_user(user), provision(user), return_exceptions=True)
+        if isinstance(success, BaseException):
+            raise success
+        if isinstance(saved, BaseException):
+            # vpn_id выводится из user_id, поэтому запись восстановится при следующем обращении
+            logger.error(f"Failed to save user {user_id}: {saved}")
+        else:
+            logger.debug("User %s created and saved to users.jsonl.", user_id)
+        return success
 
     async def extend_subscription(self, user_id: int, devices: int, duration: int) -> bool:
         """
@@ -298,25 +524,30 @@ class VPNService:
         """
         Применяет промокод для пользователя, продлевая его подписку.
         """
-        promocode = await self.promocode_service.get_promocode(promocode_code)
+        # Промокод и пользователь хранятся в разных хранилищах: ищем их одновременно
+        promocode, user = await asyncio.gather(
+            self.promocode_service.get_promocode(promocode_code),
+            self.get_user(user_id),
+        )
         if not promocode:
             logger.warning(f"Promocode {promocode_code} не найден или уже использован.")
             return False
 
-        user = await self.get_user(user_id)
-        if not user:
-            user = User(user_id=user_id, vpn_id=f"vpn_{user_id}")
-            await self.save_user(user)
-            logger.debug(f"User {user_id} created and saved to users.json.")
-
-        if await self.is_client_exists(user_id):
+        # Клиент запрашивается только для действительного кода, чтобы неверный код не порождал запросов к 3x-ui
+        client = await self.is_client_exists(user_id)
+        if client:
             # Продлеваем существующую подписку
-            success = await self.update_client(
+            success = await self._provision(
+                user_id,
                 user,
-                devices=0,  # Не изменяем количество устройств
-                duration=promocode.duration_days,
-                replace_devices=False,
-                replace_duration=False,
+                lambda user: self.update_client(
+                    user,
+                    devices=0,  # Не изменяем количество устройств
+                    duration=promocode.duration_days,
+                    replace_devices=False,
+                    replace_duration=False,
+                    client=client,
+                ),
             )
             if success:
                 await self.promocode_service.use_promocode(promocode_code)
@@ -324,10 +555,14 @@ class VPNService:
                 return True
         else:
             # Создаём нового клиента с 1 устройством (пример)
-            success = await self.create_client(
+            success = await self._provision(
+                user_id,
                 user,
-                devices=1,
-                duration=promocode.duration_days,
+                lambda user: self.create_client(
+                    user,
+                    devices=1,
+                    duration=promocode.duration_days,
+                ),
             )
             if success:
                 await self.promocode_service.use_promocode(promocode_code)
@@ -366,51 +601,75 @@ class VPNService:
                 return False
 
             user_id = request.user_id
-            success = await self.send_message_to_user(user_id, message)
-            if not success:
+            # Отправка в Telegram и смена статуса независимы: выполняем их одновременно
+            sent, updated = await asyncio.gather(
+                self.send_message_to_user(user_id, message),
+                self.request_service.update_request_status(request_id, "completed"),
+            )
+            if not sent:
+                # Пользователь не получил ответ - возвращаем заявке прежний статус
+                if updated:
+                    await self.request_service.update_request_status(request_id, request.status)
                 return False
 
-            await self.request_service.update_request_status(request_id, "completed")
+            self.invalidate_client(user_id)
             logger.info(f"Заявка {request_id} обработана и пользователь {user_id} уведомлён.")
             return True
         except Exception as e:
             logger.error(f"Ошибка при ответе на заявку {request_id}: {e}")
             return False
 
-    async def send_message_to_user(self, user_id: int, message: str) -> bool:
+    async def send_message_to_user(self, user_id: int, message: str, parse_mode: Optional[str] = None) -> bool:
         """
         Отправляет сообщение пользователю через Telegram-бота (aiogram 3.x).
+
+        :param parse_mode: Режим разметки; по умолчанию текст отправляется как есть, без разбора
+                           (текст ответа администратора может содержать символы разметки).
         """
         try:
-            # В aiogram 3.x метод send_message работает так же, parse_mode поддерживается
-            await self.bot.send_message(
-                chat_id=user_id,
-                text=message,
-                parse_mode="Markdown"  # при необходимости можете заменить на "MarkdownV2" или "HTML"
-            )
+            await self.bot.send_message(chat_id=user_id, text=message, parse_mode=parse_mode)
             logger.info(f"Сообщение пользователю {user_id} успешно отправлено.")
             return True
         except Exception as e:
             logger.error(f"Не удалось отправить сообщение пользователю {user_id}: {e}")
             return False
 
+    async def broadcast(self, user_ids: Iterable[int], message: str, parse_mode: Optional[str] = None) -> int:
+        """
+        Отправляет одно сообщение нескольким пользователям одновременно,
+        не более BROADCAST_CONCURRENCY отправок за раз.
+
+        :param user_ids: ID пользователей Telegram.
+        :param message: Текст сообщения.
+        :param parse_mode: Режим разметки (см. send_message_to_user).
+        :return: Количество успешно доставленных сообщений.
+        """
+        semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+
+        async def send(user_id: int) -> bool:
+            async with semaphore:
+                return await self.send_message_to_user(user_id, message, parse_mode)
+
+        results = await asyncio.gather(*(send(user_id) for user_id in user_ids))
+        delivered = sum(results)
+        logger.info(f"Рассылка завершена: доставлено {delivered} из {len(results)} сообщений.")
+        return delivered
+
     def _current_timestamp(self) -> int:
         """
         Возвращает текущий временной штамп в миллисекундах.
         """
-        return int(datetime.now(timezone.utc).timestamp() * 1000)
+        return time.time_ns() // 1_000_000
 
     def _add_days_to_timestamp(self, timestamp: int, days: int) -> int:
         """
         Добавляет дни к временному штампу.
         """
-        current_datetime = datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc)
-        new_datetime = current_datetime + timedelta(days=days)
-        return int(new_datetime.timestamp() * 1000)
+        # В UTC нет перехода на летнее время, поэтому сутки - ровно MS_PER_DAY
+        return timestamp + days * MS_PER_DAY
 
     def _days_to_timestamp(self, days: int) -> int:
         """
         Конвертирует дни в временной штамп.
         """
-        current_time = self._current_timestamp()
-        return self._add_days_to_timestamp(current_time, days)
+        return self._current_timestamp() + days * MS_PER_DAY
@@ -0,0 +1,80 @@
+# xui_session.py
+
+import http.cookiejar
+from typing import Any, Awaitable, Callable, Dict
+
+import httpx
+from py3xui import AsyncApi
+from py3xui.async_api.async_api_base import AsyncBaseApi
+
+KEEPALIVE_EXPIRY = 60.0  # Сколько держать простаивающее соединение с панелью открытым (в секундах)
+
+# Пул подменяет внутренние методы py3xui 0.3.2 (AsyncBaseApi._request_with_retry,
+# _check_response и атрибут session). Если после обновления py3xui их не окажется,
+# модуль должен упасть при импорте, а не молча отправлять запросы в обход пула.
+# Проверка через raise, а не assert: assert отключается при запуске с python -O.
+for _name in ("_request_with_retry", "_check_response", "session"):
+    if not hasattr(AsyncBaseApi, _name):
+        raise ImportError(f"py3xui.AsyncBaseApi.{_name} не найден: пул соединений несовместим с этой версией py3xui")
+
+
+class XUIConnectionPool:
+    """
+    Общий пул HTTP-соединений для запросов py3xui к панели 3x-ui.
+
+    py3xui открывает новый httpx.AsyncClient на каждый запрос, то есть заново устанавливает
+    TCP- и TLS-соединение и создаёт SSL-контекст. Пул подменяет отправку запросов во всех
+    под-API объекта AsyncApi, и соединения переиспользуются между запросами.
+    """
+
+    def __init__(self, api: AsyncApi, max_connections: int, keepalive_expiry: float = KEEPALIVE_EXPIRY) -> None:
+        """
+        Создаёт пул и подключает его к объекту AsyncApi.
+
+        :param api: Объект API панели 3x-ui.
+        :param max_connections: Максимум одновременно открытых соединений.
+        :param keepalive_expiry: Время жизни простаивающего соединения (в секундах).
+        """
+        if not api.client.use_tls_verify:
+            verify: Any = False
+        else:
+            verify = api.client.custom_certificate_path or True
+        self._http = httpx.AsyncClient(
+            verify=verify,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            # Cookie сессии хранит py3xui; общий клиент не должен запоминать cookie из ответов
+            cookies=http.cookiejar.CookieJar(http.cookiejar.DefaultCookiePolicy(allowed_domains=())),
+        )
+        for sub_api in (api.client, api.inbound, api.database):
+            sub_api._request_with_retry = self._make_request(sub_api)
+
+    def _make_request(self, sub_api: AsyncBaseApi) -> Callable[..., Awaitable[httpx.Response]]:
+        """
+        Создаёт замену AsyncBaseApi._request_with_retry, отправляющую запрос через общий клиент.
+        Запрос выполняется один раз: повторы при сетевых ошибках выполняет VPNService._call_api,
+        который знает, какие вызовы можно безопасно повторять.
+
+        :param sub_api: Под-API py3xui (client, inbound или database).
+        :return: Асинхронная функция отправки запроса.
+        """
+        async def request(method: str, url: str, headers: Dict[str, str], **kwargs: Any) -> httpx.Response:
+            skip_check = kwargs.pop("skip_check", False)
+            if sub_api.session:
+                headers = {**headers, "Cookie": f"3x-ui={sub_api.session}"}
+            response = await self._http.request(method, url, headers=headers, **kwargs)
+            response.raise_for_status()
+            if not skip_check:
+                await sub_api._check_response(response)
+            return response
+
+        return request
+
+    async def close(self) -> None:
+        """
+        Закрывает все соединения пула.
+        """
+        await self._http.aclose()